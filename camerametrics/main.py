@@ -1,11 +1,12 @@
 import argparse
 import asyncio
+import contextlib
 import logging
 import signal
 import time
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Union
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
 
 import httpx
 import prometheus_client as prom
@@ -20,8 +21,10 @@ from prometheus_client import (
     push_to_gateway,
     start_http_server,
 )
+from sinks import Sink, Snapshot, build_sinks
 from utils.config import Context, configure_logging
 from utils.constants import (
+    API_PAGE_URL_TEMPLATE,
     API_URL_TEMPLATE,
     DEFAULT_LOG_LEVEL,
     MAX_RETRIES,
@@ -42,33 +45,24 @@ def extract_and_update_camera_metrics(
     - registry (CollectorRegistry): Prometheus collector registry to which metrics will be registered.
     """
     for camera in camera_data:
-        name = camera.get("name", "")
-        model = camera.get("model", "")
-        cpu_load = camera.get("systemInfo", {}).get("cpuLoad", 0.0)
-        memory_used = camera.get("systemInfo", {}).get("memory", {}).get("used", 0)
-        memory_total = camera.get("systemInfo", {}).get("memory", {}).get("total", 0)
-
-        host = camera.get("host", "")
-        mac = camera.get("mac", "")
-        firmware_version = camera.get("firmwareVersion", "")
-        managed = str(camera.get("managed", "")).lower()
-        last_seen = camera.get("lastSeen", "")
-        state = camera.get("state", "")
-        last_recording_start_time = camera.get("lastRecordingStartTime", "")
+        fields = extract_camera_fields(camera)
+        name = fields["name"]
 
         # Update Prometheus metrics for each camera
         metrics["g_name"].labels(name=name).set(1 if name else 0)
-        metrics["g_model"].labels(name=name).info({"camera_model": model})
-        metrics["g_cpu_load"].labels(name=name).set(cpu_load)
-        metrics["g_memory_used"].labels(name=name).set(memory_used)
-        metrics["g_memory_total"].labels(name=name).set(memory_total)
-        metrics["g_host"].labels(name=name).info({"camera_host": host})
-        metrics["g_mac"].labels(name=name).info({"camera_mac": mac})
-        metrics["g_firmware_version"].labels(name=name).info({"camera_firmware_version": firmware_version})
-        metrics["g_managed"].labels(name=name).set(1 if managed else 0)
-        metrics["g_last_seen"].labels(name=name).set(last_seen)
-        metrics["g_state"].labels(name=name, state=state).set(1 if str.upper(state) == "CONNECTED" else 0)
-        metrics["g_last_recording_start_time"].labels(name=name).set(last_recording_start_time)
+        metrics["g_model"].labels(name=name).info({"camera_model": fields["model"]})
+        metrics["g_cpu_load"].labels(name=name).set(fields["cpu_load"])
+        metrics["g_memory_used"].labels(name=name).set(fields["memory_used"])
+        metrics["g_memory_total"].labels(name=name).set(fields["memory_total"])
+        metrics["g_host"].labels(name=name).info({"camera_host": fields["host"]})
+        metrics["g_mac"].labels(name=name).info({"camera_mac": fields["mac"]})
+        metrics["g_firmware_version"].labels(name=name).info({"camera_firmware_version": fields["firmware_version"]})
+        metrics["g_managed"].labels(name=name).set(1 if fields["managed"] else 0)
+        metrics["g_last_seen"].labels(name=name).set(fields["last_seen"])
+        metrics["g_state"].labels(name=name, state=fields["state"]).set(
+            1 if str.upper(fields["state"]) == "CONNECTED" else 0
+        )
+        metrics["g_last_recording_start_time"].labels(name=name).set(fields["last_recording_start_time"])
         logging.info(f"Updated metrics for camera: {name}")
 
         # do we need to push metrics?
@@ -80,47 +74,202 @@ def extract_and_update_camera_metrics(
                 logging.error(f"Error: {e}")
 
 
-async def fetch_and_update(ctx: Context, metrics: Dict[str, Any], registry: CollectorRegistry) -> None:
+def extract_camera_fields(camera: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Calls get_cameras() to get a JSON response containing camera metrics, then sends that to be processed into
-    updated metrics.
+    Picks the fields we report on out of a single camera's JSON object, filling in defaults for anything missing.
 
-    This function loops until shutdown is requested.
+    Parameters:
+    - camera (dict): JSON object describing one camera
+
+    Returns:
+    - dict: The extracted fields, keyed by metric name.
+    """
+    return {
+        "name": camera.get("name", ""),
+        "model": camera.get("model", ""),
+        "cpu_load": camera.get("systemInfo", {}).get("cpuLoad", 0.0),
+        "memory_used": camera.get("systemInfo", {}).get("memory", {}).get("used", 0),
+        "memory_total": camera.get("systemInfo", {}).get("memory", {}).get("total", 0),
+        "host": camera.get("host", ""),
+        "mac": camera.get("mac", ""),
+        "firmware_version": camera.get("firmwareVersion", ""),
+        "managed": str(camera.get("managed", "")).lower(),
+        "last_seen": camera.get("lastSeen", ""),
+        "state": camera.get("state", ""),
+        "last_recording_start_time": camera.get("lastRecordingStartTime", ""),
+    }
+
+
+async def fetch_and_update(
+    ctx: Context, metrics: Dict[str, Any], registry: CollectorRegistry, sinks: Optional[List[Sink]] = None
+) -> None:
+    """
+    Calls get_camera_pages() to get camera metrics, then sends each page to be processed into updated metrics as
+    soon as it arrives.
+
+    Each completed cycle is also handed to the configured sinks as a snapshot. Sinks queue and write in the
+    background, so a slow sink never holds up the next fetch.
+
+    This function loops until shutdown is requested, then flushes and closes the sinks.
 
     Parameters:
     - ctx (Context): Context containing config parameters.
     - metrics (dict): A dictionary containing the metrics we want to update.
     - registry (CollectorRegistry): Prometheus collector registry to which metrics will be registered.
+    - sinks (list): Additional outputs to feed each cycle's snapshot to.
     """
-    while not shutdown_requested:
-        response = await get_cameras(ctx)
+    sinks = sinks or []
 
-        if "data" in response:
-            extract_and_update_camera_metrics(response["data"], metrics, ctx, registry)
-
-        await asyncio.sleep(ctx.refresh_rate)
+    try:
+        for sink in sinks:
+            await sink.start()
+
+        while not shutdown_requested:
+            cameras = []
+            # aclosing() makes sure the page fetches and their client are cleaned up if updating a page fails
+            async with contextlib.aclosing(get_camera_pages(ctx)) as pages:
+                async for page in pages:
+                    extract_and_update_camera_metrics(page, metrics, ctx, registry)
+                    if sinks:
+                        cameras.extend(extract_camera_fields(camera) for camera in page)
+
+            if cameras:
+                snapshot = Snapshot(cameras)
+                for sink in sinks:
+                    sink.submit(snapshot)
+
+            await asyncio.sleep(ctx.refresh_rate)
+    finally:
+        for sink in sinks:
+            try:
+                await sink.close()
+            except Exception as e:
+                logging.error(f"Error closing the {sink.name} sink: {e}")
 
 
 async def get_cameras(ctx: Context) -> Union[Dict[str, Any], None]:
     """
-    Makes the API call to the Unifi Video host. If the response doesn't contain camera data, it will retry up to
-    MAX_RETRIES, waiting RETRY_DELAY seconds between each attemps. These are defined as constants - constants.py
+    Makes the API call to the Unifi Video host, fetching the whole camera list in one response.
 
     Parameters:
     - ctx (Context): Context containing config parameters.
 
     Returns:
-    - dict: Dictionary containing created metrics.
+    - dict: The JSON response, or None if the cameras couldn't be fetched.
     """
     url = API_URL_TEMPLATE.format(host=ctx.api_host, port=ctx.api_port, key=ctx.api_key)
+    async with httpx.AsyncClient(verify=False) as client:
+        return await fetch_json(client, url)
+
+
+async def get_camera_pages(ctx: Context) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Yields the camera list one page at a time, in the order the pages arrive.
+
+    When ctx.page_size is 0 the whole list is fetched with get_cameras() and yielded as a single page. Otherwise the
+    first page is fetched to learn meta.totalCount and how many cameras the controller returns per page, then the
+    remaining pages are requested with up to ctx.max_pages_in_flight in flight at once over a shared client. Cameras
+    that show up on more than one page (because the list shifted between requests) are only yielded once, and the
+    number of cameras received is checked against totalCount once every page is in.
+
+    Parameters:
+    - ctx (Context): Context containing config parameters.
+
+    Yields:
+    - list: Array of JSON objects, one per camera
+    """
+    if not ctx.page_size:
+        response = await get_cameras(ctx)
+        if response and "data" in response:
+            yield response["data"]
+        return
+
+    seen = set()
+
+    def unseen(cameras: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        page = []
+        for camera in cameras:
+            camera_id = camera.get("_id")
+            if camera_id is not None:
+                if camera_id in seen:
+                    continue
+                seen.add(camera_id)
+            page.append(camera)
+        return page
+
+    limits = httpx.Limits(max_connections=ctx.max_pages_in_flight, max_keepalive_connections=ctx.max_pages_in_flight)
+    async with httpx.AsyncClient(verify=False, limits=limits) as client:
+
+        async def fetch_page(offset: int, limit: int, semaphore: asyncio.Semaphore) -> Union[Dict[str, Any], None]:
+            url = API_PAGE_URL_TEMPLATE.format(
+                host=ctx.api_host, port=ctx.api_port, key=ctx.api_key, offset=offset, limit=limit
+            )
+            return await fetch_json(client, url, semaphore)
+
+        semaphore = asyncio.Semaphore(ctx.max_pages_in_flight)
+        first_page = await fetch_page(0, ctx.page_size, semaphore)
+        if not first_page or "data" not in first_page:
+            return
+
+        page = unseen(first_page["data"])
+        received = len(page)
+        yield page
+
+        total_count = first_page.get("meta", {}).get("totalCount")
+        if total_count is None:
+            logging.warning("Camera list response has no meta.totalCount, only the first page was fetched")
+            return
+
+        # The controller may cap the page size below what we asked for, so page by what it actually returned
+        page_size = len(first_page["data"])
+        if page_size < min(ctx.page_size, total_count):
+            if not page_size:
+                logging.warning(f"First page was empty, but the controller reported a totalCount of {total_count}")
+                return
+            logging.info(f"Controller returned {page_size} cameras per page instead of {ctx.page_size}")
+
+        tasks = [
+            asyncio.create_task(fetch_page(offset, page_size, semaphore))
+            for offset in range(page_size, total_count, page_size)
+        ]
+        try:
+            for next_page in asyncio.as_completed(tasks):
+                response = await next_page
+                if response and "data" in response:
+                    page = unseen(response["data"])
+                    received += len(page)
+                    yield page
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    if received != total_count:
+        logging.warning(f"Received {received} cameras, but the controller reported a totalCount of {total_count}")
+
+
+async def fetch_json(
+    client: httpx.AsyncClient, url: str, semaphore: Optional[asyncio.Semaphore] = None
+) -> Union[Dict[str, Any], None]:
+    """
+    Makes a GET request using the given client. If the request fails, it will retry up to MAX_RETRIES, waiting
+    RETRY_DELAY seconds between each attempt. These are defined as constants - constants.py
+
+    Parameters:
+    - client (httpx.AsyncClient): The client to make the request with.
+    - url (str): The URL to fetch.
+    - semaphore (asyncio.Semaphore): If given, held for each request but released while waiting to retry.
+
+    Returns:
+    - dict: The JSON response, or None if every attempt failed.
+    """
     retries = 0
 
     while retries < MAX_RETRIES:
         try:
-            async with httpx.AsyncClient(verify=False) as client:
+            async with semaphore or contextlib.nullcontext():
                 response = await client.get(url)
-                response.raise_for_status()
-                return response.json()
+            response.raise_for_status()
+            return response.json()
 
         except httpx.HTTPError as e:
             logging.error(f"HTTP error while fetching camera data: {e}. Retrying in {RETRY_DELAY} seconds...")
@@ -156,6 +305,10 @@ def main() -> None:
         logging.info(f"Starting web service on port {ctx.http_port}")
         start_http_server(ctx.http_port, registry=registry)
 
+    sinks = build_sinks(ctx.sinks)
+    for sink in sinks:
+        logging.info(f"Configured to write metrics to the {sink.name} sink")
+
     loop = asyncio.get_event_loop()
 
     # Set up a signal handler for Ctrl+C (SIGINT)
@@ -172,8 +325,10 @@ def main() -> None:
     try:
         logging.info(f"Fetching metrics from {ctx.api_host}")
         logging.info(f"Refreshing metrics every {ctx.refresh_rate} seconds")
+        if ctx.page_size:
+            logging.info(f"Fetching {ctx.page_size} cameras per page, {ctx.max_pages_in_flight} pages at a time")
 
-        loop.run_until_complete(fetch_and_update(ctx, metrics, registry))
+        loop.run_until_complete(fetch_and_update(ctx, metrics, registry, sinks))
 
     except Exception as e:
         logging.exception(f"Error encountered: {e}")
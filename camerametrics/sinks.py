@@ -0,0 +1,384 @@
+import asyncio
+import json
+import logging
+import re
+import socket
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from utils.constants import (
+    DEFAULT_SINK_BATCH_SIZE,
+    DEFAULT_SINK_CLOSE_TIMEOUT,
+    DEFAULT_SINK_FLUSH_INTERVAL,
+    DEFAULT_SINK_MAX_QUEUE,
+    DEFAULT_STATSD_MAX_PACKET_SIZE,
+    DEFAULT_STATSD_PORT,
+    DEFAULT_STATSD_PREFIX,
+)
+
+
+class SinkWriteError(Exception):
+    """Raised by Sink.write() when only the first `sent` lines of a batch made it out"""
+
+    def __init__(self, message: str, sent: int) -> None:
+        super().__init__(message)
+        self.sent = sent
+
+
+# Queued by close() to tell the worker that no more snapshots will follow
+_CLOSE = object()
+
+
+@dataclass
+class Snapshot:
+    """The camera fields extracted during one completed fetch cycle"""
+
+    cameras: List[Dict[str, Any]]
+    timestamp: float = field(default_factory=time.time)
+
+
+class Sink(ABC):
+    """
+    Base class for output sinks. A sink queues each snapshot on its own bounded queue, and a background task turns
+    the snapshots into lines and writes them out in batches, so a slow sink never stalls polling. When the queue is
+    full the oldest snapshot is dropped to make room. Its lines, and those of any batch that failed to write, are
+    counted in `dropped`.
+
+    Subclasses implement format() and write().
+    """
+
+    def __init__(
+        self,
+        name: str,
+        batch_size: int = DEFAULT_SINK_BATCH_SIZE,
+        flush_interval: float = DEFAULT_SINK_FLUSH_INTERVAL,
+        max_queue: int = DEFAULT_SINK_MAX_QUEUE,
+    ) -> None:
+        if batch_size < 1:
+            raise ValueError(f"Sink {name}: batch_size must be at least 1, got {batch_size}")
+        if max_queue < 1:
+            raise ValueError(f"Sink {name}: max_queue must be at least 1, got {max_queue}")
+        if flush_interval < 0:
+            raise ValueError(f"Sink {name}: flush_interval can't be negative, got {flush_interval}")
+
+        self.name = name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.sent = 0
+        self.dropped = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: List[str] = []
+
+    @abstractmethod
+    def format(self, snapshot: Snapshot) -> List[str]:
+        """Serialise a snapshot into the lines this sink writes"""
+
+    @abstractmethod
+    async def write(self, batch: List[str]) -> None:
+        """Write a batch of lines to the sink's destination"""
+
+    def count_lines(self, snapshot: Snapshot) -> int:
+        """Counts the lines format() would produce for a snapshot, without formatting it. One per camera by default."""
+        return len(snapshot.cameras)
+
+    async def open(self) -> None:
+        """Acquire any resources the sink needs before its first write"""
+
+    async def release(self) -> None:
+        """Release the resources acquired in open()"""
+
+    async def start(self) -> None:
+        """Opens the sink and starts its background writer. Must be called from within the running event loop."""
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        await self.open()
+        self._task = asyncio.create_task(self.run())
+
+    def submit(self, snapshot: Snapshot) -> None:
+        """
+        Queues a snapshot for writing without waiting. If the queue is full, the oldest queued snapshot is dropped.
+
+        Parameters:
+        - snapshot (Snapshot): The snapshot of the cycle that just completed.
+        """
+        if self._queue.full():
+            dropped = self.count_lines(self._queue.get_nowait())
+            self.dropped += dropped
+            logging.warning(
+                f"Sink {self.name}: queue full, dropped the oldest snapshot ({dropped} lines, {self.dropped} in total)"
+            )
+        self._queue.put_nowait(snapshot)
+
+    async def run(self) -> None:
+        """
+        Pulls snapshots off the queue and writes their lines in batches of batch_size. Lines that don't fill a batch
+        are written once flush_interval has passed since the first of them arrived.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = 0.0
+
+        while True:
+            timeout = max(deadline - loop.time(), 0) if self._pending else None
+            try:
+                snapshot = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                await self._write_pending()
+                continue
+
+            if snapshot is _CLOSE:
+                await self._write_pending()
+                return
+
+            try:
+                lines = self.format(snapshot)
+            except Exception as e:
+                dropped = self.count_lines(snapshot)
+                self.dropped += dropped
+                logging.error(f"Sink {self.name}: failed to format a snapshot, dropped {dropped} lines: {e}")
+                continue
+
+            if not self._pending:
+                deadline = loop.time() + self.flush_interval
+            self._pending.extend(lines)
+            while len(self._pending) >= self.batch_size:
+                await self._write_batch()
+
+    async def close(self, timeout: float = DEFAULT_SINK_CLOSE_TIMEOUT) -> None:
+        """
+        Flushes whatever is still queued, stops the background writer and releases the sink's resources.
+
+        Parameters:
+        - timeout (float): How long to wait for the queue to drain before giving up on it.
+        """
+        if self._task is None:
+            await self.release()
+            return
+
+        try:
+            await asyncio.wait_for(self._drain(), timeout)
+        except asyncio.TimeoutError:
+            logging.error(f"Sink {self.name}: timed out flushing queued lines after {timeout} seconds")
+            self._task.cancel()
+            self.dropped += len(self._pending)
+            while not self._queue.empty():
+                snapshot = self._queue.get_nowait()
+                if snapshot is not _CLOSE:
+                    self.dropped += self.count_lines(snapshot)
+        finally:
+            self._task = None
+            self._pending = []
+            await self.release()
+
+        logging.info(f"Sink {self.name}: closed after sending {self.sent} lines, dropped {self.dropped}")
+
+    async def _drain(self) -> None:
+        await self._queue.put(_CLOSE)
+        await self._task
+
+    async def _write_pending(self) -> None:
+        while self._pending:
+            await self._write_batch()
+
+    async def _write_batch(self) -> None:
+        # Lines stay pending until the write finishes, so a cancelled write still counts them as dropped
+        batch = self._pending[: self.batch_size]
+        try:
+            await self.write(batch)
+            self.sent += len(batch)
+        except SinkWriteError as e:
+            self.sent += e.sent
+            self.dropped += len(batch) - e.sent
+            logging.error(f"Sink {self.name}: failed to write {len(batch) - e.sent} of {len(batch)} lines: {e}")
+        except Exception as e:
+            self.dropped += len(batch)
+            logging.error(f"Sink {self.name}: failed to write {len(batch)} lines: {e}")
+        del self._pending[: len(batch)]
+
+
+class InfluxDBSink(Sink):
+    """Writes InfluxDB line protocol to an HTTP write endpoint, one point per camera per cycle"""
+
+    TAGS = ("name", "model", "host", "mac", "firmware_version", "state")
+
+    def __init__(self, url: str, token: Optional[str] = None, measurement: str = "camera", **kwargs: Any) -> None:
+        super().__init__("influxdb", **kwargs)
+        self.url = url
+        self.token = token
+        self.measurement = measurement
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def format(self, snapshot: Snapshot) -> List[str]:
+        timestamp = int(snapshot.timestamp * 1e9)
+        lines = []
+        for camera in snapshot.cameras:
+            tags = "".join(
+                f",{key}={_escape_influx_tag(str(camera[key]))}"
+                for key in self.TAGS
+                if camera.get(key) not in ("", None)
+            )
+            fields = {
+                "cpu_load": float(camera["cpu_load"]),
+                "memory_used": camera["memory_used"],
+                "memory_total": camera["memory_total"],
+                "managed": camera["managed"] == "true",
+                "connected": str.upper(camera["state"]) == "CONNECTED",
+                "last_seen": camera["last_seen"],
+                "last_recording_start_time": camera["last_recording_start_time"],
+            }
+            field_set = ",".join(
+                f"{key}={_format_influx_field(value)}" for key, value in fields.items() if value not in ("", None)
+            )
+            lines.append(f"{self.measurement}{tags} {field_set} {timestamp}")
+        return lines
+
+    async def open(self) -> None:
+        headers = {"Authorization": f"Token {self.token}"} if self.token else {}
+        self._client = httpx.AsyncClient(headers=headers)
+
+    async def release(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def write(self, batch: List[str]) -> None:
+        response = await self._client.post(self.url, content="\n".join(batch).encode())
+        response.raise_for_status()
+
+
+class StatsDSink(Sink):
+    """Sends camera metrics as StatsD gauges over UDP, packing as many lines into each datagram as will fit"""
+
+    GAUGES = ("cpu_load", "memory_used", "memory_total", "last_seen", "last_recording_start_time")
+
+    def __init__(
+        self,
+        host: str,
+        port: int = DEFAULT_STATSD_PORT,
+        prefix: str = DEFAULT_STATSD_PREFIX,
+        max_packet_size: int = DEFAULT_STATSD_MAX_PACKET_SIZE,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__("statsd", **kwargs)
+        self.host = host
+        self.port = port
+        self.prefix = prefix
+        self.max_packet_size = max_packet_size
+        self._socket: Optional[socket.socket] = None
+        self._address: Optional[Tuple[Any, ...]] = None
+
+    def format(self, snapshot: Snapshot) -> List[str]:
+        lines = []
+        for camera in snapshot.cameras:
+            stat = f"{self.prefix}.{_sanitise_statsd_name(str(camera['name'] or ''))}"
+            for key in self.GAUGES:
+                if camera[key] not in ("", None):
+                    lines.append(f"{stat}.{key}:{camera[key]}|g")
+            lines.append(f"{stat}.managed:{1 if camera['managed'] == 'true' else 0}|g")
+            lines.append(f"{stat}.connected:{1 if str.upper(camera['state']) == 'CONNECTED' else 0}|g")
+        return lines
+
+    def count_lines(self, snapshot: Snapshot) -> int:
+        return sum(
+            sum(1 for key in self.GAUGES if camera.get(key) not in ("", None)) + 2 for camera in snapshot.cameras
+        )
+
+    def packets(self, batch: List[str]) -> List[bytes]:
+        """Joins a batch of lines into newline separated datagrams of at most max_packet_size bytes"""
+        packets = []
+        packet = b""
+        for line in batch:
+            encoded = line.encode()
+            if packet and len(packet) + 1 + len(encoded) > self.max_packet_size:
+                packets.append(packet)
+                packet = b""
+            packet = packet + b"\n" + encoded if packet else encoded
+        if packet:
+            packets.append(packet)
+        return packets
+
+    async def open(self) -> None:
+        # Resolve the host once up front, so sendto() never does a blocking DNS lookup on the event loop
+        loop = asyncio.get_running_loop()
+        family, _, _, _, self._address = (await loop.getaddrinfo(self.host, self.port, type=socket.SOCK_DGRAM))[0]
+        self._socket = socket.socket(family, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+
+    async def release(self) -> None:
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    async def write(self, batch: List[str]) -> None:
+        sent = 0
+        for packet in self.packets(batch):
+            try:
+                self._socket.sendto(packet, self._address)
+            except OSError as e:
+                raise SinkWriteError(str(e), sent) from e
+            sent += packet.count(b"\n") + 1
+
+
+class FileSink(Sink):
+    """Appends one JSON object per camera per cycle to a newline delimited JSON file"""
+
+    def __init__(self, path: str, **kwargs: Any) -> None:
+        super().__init__("file", **kwargs)
+        self.path = path
+
+    def format(self, snapshot: Snapshot) -> List[str]:
+        return [json.dumps({"timestamp": snapshot.timestamp, **camera}) for camera in snapshot.cameras]
+
+    async def write(self, batch: List[str]) -> None:
+        await asyncio.to_thread(self._append, batch)
+
+    def _append(self, batch: List[str]) -> None:
+        with open(self.path, "a") as f:
+            f.write("".join(f"{line}\n" for line in batch))
+
+
+SINK_TYPES = {"influxdb": InfluxDBSink, "statsd": StatsDSink, "file": FileSink}
+
+
+def build_sinks(sink_configs: List[Dict[str, Any]]) -> List[Sink]:
+    """
+    Creates the sinks described in the config.
+
+    Parameters:
+    - sink_configs (list): One dictionary per sink. "type" selects the sink, the remaining keys are passed to it.
+
+    Returns:
+    - list: The configured sinks, not yet started.
+    """
+    sinks = []
+    for sink_config in sink_configs:
+        options = dict(sink_config)
+        sink_type = options.pop("type", None)
+        if sink_type not in SINK_TYPES:
+            raise ValueError(f"Unknown sink type '{sink_type}', expected one of {', '.join(SINK_TYPES)}")
+        try:
+            sinks.append(SINK_TYPES[sink_type](**options))
+        except TypeError as e:
+            raise ValueError(f"Invalid options for the {sink_type} sink: {e}") from e
+    return sinks
+
+
+def _escape_influx_tag(value: str) -> str:
+    return value.replace("\\", "\\\\").replace(",", "\\,").replace("=", "\\=").replace(" ", "\\ ")
+
+
+def _format_influx_field(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return f"{value}i"
+    if isinstance(value, float):
+        return repr(value)
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _sanitise_statsd_name(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_-]", "_", name) or "unnamed"
@@ -1,13 +1,15 @@
 import logging
 import tomllib
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 from .constants import (
     DEFAULT_CONFIG_FILE,
     DEFAULT_ENV,
     DEFAULT_LOG_FILE,
     DEFAULT_LOG_FORMAT,
+    DEFAULT_MAX_PAGES_IN_FLIGHT,
+    DEFAULT_PAGE_SIZE,
 )
 
 
@@ -22,6 +24,9 @@ class ContextData:
     gateway: str
     gateway_port: int
     job: str
+    page_size: int = DEFAULT_PAGE_SIZE
+    max_pages_in_flight: int = DEFAULT_MAX_PAGES_IN_FLIGHT
+    sinks: List[Dict[str, Any]] = field(default_factory=list)
 
     # def __post_init__(self):
     #     print(self)
@@ -43,7 +48,14 @@ class Context:
             gateway=data[env]["gateway"],
             gateway_port=data[env]["gateway_port"],
             job=data[env]["job"],
+            page_size=data[env].get("page_size", DEFAULT_PAGE_SIZE),
+            max_pages_in_flight=data[env].get("max_pages_in_flight", DEFAULT_MAX_PAGES_IN_FLIGHT),
+            sinks=data[env].get("sinks", []),
         )
+        if ctx.page_size < 0:
+            raise ValueError(f"page_size must be 0 (fetch the whole camera list at once) or more, got {ctx.page_size}")
+        if ctx.max_pages_in_flight < 1:
+            raise ValueError(f"max_pages_in_flight must be at least 1, got {ctx.max_pages_in_flight}")
         return ctx
 
 
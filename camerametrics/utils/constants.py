@@ -1,5 +1,6 @@
 # Constants used in our camerametrics package
 API_URL_TEMPLATE = "https://{host}:{port}/api/2.0/camera?apiKey={key}"
+API_PAGE_URL_TEMPLATE = API_URL_TEMPLATE + "&offset={offset}&limit={limit}"
 DEFAULT_CONFIG_FILE = ".config.toml"
 DEFAULT_ENV = "Dev"
 DEFAULT_LOG_FILE = "logs/camerametrics.log"
@@ -7,3 +8,12 @@ DEFAULT_LOG_FORMAT = "%(asctime)-15s  %(levelname)s  %(message)s"
 DEFAULT_LOG_LEVEL = "INFO"
 MAX_RETRIES = 3  # Maximum number of retries
 RETRY_DELAY = 5  # Delay in seconds before retrying
+DEFAULT_PAGE_SIZE = 0  # Cameras fetched per page, 0 fetches the whole list in one response
+DEFAULT_MAX_PAGES_IN_FLIGHT = 4  # Pages requested concurrently when paging is enabled
+DEFAULT_SINK_BATCH_SIZE = 500  # Maximum number of lines a sink writes in one go
+DEFAULT_SINK_FLUSH_INTERVAL = 1.0  # Seconds a sink waits to fill a batch before writing what it has
+DEFAULT_SINK_MAX_QUEUE = 10  # Snapshots a sink will hold before it starts dropping the oldest
+DEFAULT_SINK_CLOSE_TIMEOUT = 10.0  # Seconds a sink gets to flush its queue on shutdown
+DEFAULT_STATSD_PORT = 8125
+DEFAULT_STATSD_PREFIX = "camerametrics"
+DEFAULT_STATSD_MAX_PACKET_SIZE = 1432  # Keeps datagrams within a typical ethernet MTU
@@ -38,6 +38,14 @@ def test_read_config_with_defaults(mocker: MockerFixture):
     mocked_load.assert_called_once()
 
 
+@pytest.mark.parametrize("paging", [{"page_size": -1}, {"page_size": 100, "max_pages_in_flight": 0}])
+def test_read_config_with_invalid_paging(paging, mock_toml_load):
+    mock_toml_load.return_value = {"Dev": {**MOCK_TOML_DATA_DEV["Dev"], **paging}}
+
+    with pytest.raises(ValueError):
+        Context.read_config()
+
+
 @pytest.mark.parametrize("env,expected_api_host", [("Dev", "localhost"), ("Prod", "mock.production.host")])
 def test_read_config_parameterized(env, expected_api_host, mock_toml_load):
     if env == "Dev":
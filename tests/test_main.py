@@ -1,7 +1,16 @@
+import asyncio
+
+import httpx
 import pytest
 from pytest_mock import MockerFixture
 
-from camerametrics.main import extract_and_update_camera_metrics, get_cameras
+from camerametrics.main import (
+    extract_and_update_camera_metrics,
+    fetch_and_update,
+    get_camera_pages,
+    get_cameras,
+)
+from camerametrics.sinks import FileSink, StatsDSink
 from camerametrics.utils.config import Context
 
 from .responses import CAMERA_VALID_RESPONSE, MOCK_METRICS, MOCK_TOML_DATA_DEV
@@ -58,6 +67,198 @@ async def test_get_cameras(mocker, mock_context):
     assert response == CAMERA_VALID_RESPONSE
 
 
+def mock_paged_client(mocker: MockerFixture, pages, total_count):
+    # Serve the page for the offset in the URL, failing the request if that page is None.
+    # Each request yields to the event loop so that concurrent requests overlap, and the peak overlap is recorded.
+    in_flight = {"current": 0, "peak": 0}
+
+    async def get(url):
+        query = dict(param.split("=") for param in url.split("?")[1].split("&"))
+        in_flight["current"] += 1
+        in_flight["peak"] = max(in_flight["peak"], in_flight["current"])
+        await asyncio.sleep(0.01)
+        in_flight["current"] -= 1
+
+        page = pages[int(query["offset"])]
+        if page is None:
+            raise httpx.ConnectError("connection refused")
+        response = mocker.MagicMock()
+        response.json.return_value = {"data": page, "meta": {"totalCount": total_count, "filteredCount": total_count}}
+        return response
+
+    mock_client = mocker.MagicMock()
+    mock_client.get = mocker.AsyncMock(side_effect=get)
+
+    mock_async_context_manager = mocker.MagicMock()
+    mock_async_context_manager.__aenter__.return_value = mock_client
+    mock_async_context_manager.__aexit__ = mocker.AsyncMock(return_value=None)
+
+    mocker.patch("httpx.AsyncClient", return_value=mock_async_context_manager)
+    return mock_client, in_flight
+
+
+def mock_cameras(count):
+    return [{"_id": str(i), "name": f"Camera {i}"} for i in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_get_camera_pages(mocker, mock_context):
+    cameras = mock_cameras(5)
+    pages = {offset: cameras[offset : offset + 1] for offset in range(5)}
+    mock_client, in_flight = mock_paged_client(mocker, pages, total_count=5)
+    mock_warning = mocker.patch("logging.warning")
+    mock_context.page_size = 1
+    mock_context.max_pages_in_flight = 3
+
+    received = [page async for page in get_camera_pages(mock_context)]
+
+    assert received[0] == cameras[:1]
+    assert sorted(camera["_id"] for page in received for camera in page) == [camera["_id"] for camera in cameras]
+    assert mock_client.get.call_count == 5
+    assert 2 <= in_flight["peak"] <= mock_context.max_pages_in_flight
+    mock_warning.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_camera_pages_skips_duplicate_cameras(mocker, mock_context):
+    # Camera 1 shows up on the first two pages, as it would if the list shifted between requests
+    cameras = mock_cameras(5)
+    pages = {0: cameras[0:2], 2: cameras[1:3], 4: cameras[3:5]}
+    mock_paged_client(mocker, pages, total_count=5)
+    mock_warning = mocker.patch("logging.warning")
+    mock_context.page_size = 2
+
+    received = [camera async for page in get_camera_pages(mock_context) for camera in page]
+
+    assert sorted(camera["_id"] for camera in received) == [camera["_id"] for camera in cameras]
+    mock_warning.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_camera_pages_follows_a_capped_page_size(mocker, mock_context):
+    # The controller only returns 2 cameras per page, even though 3 were asked for
+    cameras = mock_cameras(6)
+    mock_client, _ = mock_paged_client(mocker, {0: cameras[0:2], 2: cameras[2:4], 4: cameras[4:6]}, total_count=6)
+    mocker.patch("logging.info")
+    mock_warning = mocker.patch("logging.warning")
+    mock_context.page_size = 3
+
+    received = [camera async for page in get_camera_pages(mock_context) for camera in page]
+
+    assert sorted(camera["_id"] for camera in received) == [camera["_id"] for camera in cameras]
+    assert all(call.args[0].endswith("limit=2") for call in mock_client.get.call_args_list[1:])
+    mock_warning.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_camera_pages_warns_on_total_count_mismatch(mocker, mock_context):
+    cameras = mock_cameras(3)
+    mock_paged_client(mocker, {0: cameras[0:2], 2: cameras[2:3]}, total_count=4)
+    mock_warning = mocker.patch("logging.warning")
+    mock_context.page_size = 2
+
+    received = [page async for page in get_camera_pages(mock_context)]
+
+    assert sum(len(page) for page in received) == 3
+    mock_warning.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_get_camera_pages_warns_when_a_page_fails(mocker, mock_context):
+    cameras = mock_cameras(6)
+    mock_paged_client(mocker, {0: cameras[0:2], 2: None, 4: cameras[4:6]}, total_count=6)
+    mocker.patch("camerametrics.main.RETRY_DELAY", 0)
+    mocker.patch("logging.error")
+    mock_warning = mocker.patch("logging.warning")
+    mock_context.page_size = 2
+
+    received = [camera async for page in get_camera_pages(mock_context) for camera in page]
+
+    assert [camera["_id"] for camera in received] == ["0", "1", "4", "5"]
+    mock_warning.assert_called_once()
+    assert "totalCount of 6" in mock_warning.call_args.args[0]
+
+
+@pytest.mark.asyncio
+async def test_get_camera_pages_releases_the_slot_while_a_page_retries(mocker, mock_context):
+    # With one page in flight at a time, a failing page must not hold its slot while it waits to retry
+    cameras = mock_cameras(4)
+    mock_paged_client(mocker, {0: cameras[0:1], 1: None, 2: cameras[2:3], 3: cameras[3:4]}, total_count=4)
+    mocker.patch("camerametrics.main.RETRY_DELAY", 0.2)
+    mocker.patch("logging.error")
+    mocker.patch("logging.warning")
+    mock_context.page_size = 1
+    mock_context.max_pages_in_flight = 1
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+
+    arrivals = {
+        camera["_id"]: loop.time() - started async for page in get_camera_pages(mock_context) for camera in page
+    }
+
+    assert sorted(arrivals) == ["0", "2", "3"]
+    assert max(arrivals.values()) < 0.2
+
+
+@pytest.mark.asyncio
+async def test_get_camera_pages_unpaged(mocker, mock_context):
+    mocker.patch("camerametrics.main.get_cameras", mocker.AsyncMock(return_value=CAMERA_VALID_RESPONSE))
+
+    pages = [page async for page in get_camera_pages(mock_context)]
+
+    assert pages == [CAMERA_VALID_RESPONSE["data"]]
+
+
+@pytest.mark.asyncio
+async def test_fetch_and_update_closes_started_sinks_when_a_sink_fails_to_open(mocker, mock_context, tmp_path):
+    mocker.patch("camerametrics.main.shutdown_requested", False, create=True)
+    started_sink = FileSink(path=str(tmp_path / "metrics.ndjson"))
+    failing_sink = StatsDSink(host="statsd.invalid")
+    mocker.patch.object(failing_sink, "open", side_effect=OSError("name resolution failed"))
+    mocker.patch("logging.info")
+
+    with pytest.raises(OSError):
+        await fetch_and_update(mock_context, {}, mocker.MagicMock(), [started_sink, failing_sink])
+
+    assert started_sink._task is None
+    assert failing_sink._task is None
+
+
+@pytest.mark.asyncio
+async def test_fetch_and_update_closes_every_sink_when_one_fails_to_close(mocker, mock_context, tmp_path):
+    mocker.patch("camerametrics.main.shutdown_requested", True, create=True)
+    failing_sink = FileSink(path=str(tmp_path / "failing.ndjson"))
+    close = failing_sink.close
+
+    async def close_then_fail():
+        await close()
+        raise RuntimeError("writer crashed")
+
+    mocker.patch.object(failing_sink, "close", side_effect=close_then_fail)
+    other_sink = FileSink(path=str(tmp_path / "metrics.ndjson"))
+    mocker.patch("logging.info")
+    mock_error = mocker.patch("logging.error")
+
+    await fetch_and_update(mock_context, {}, mocker.MagicMock(), [failing_sink, other_sink])
+
+    assert other_sink._task is None
+    mock_error.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_fetch_and_update_closes_the_page_fetch_when_an_update_fails(mocker, mock_context):
+    mocker.patch("camerametrics.main.shutdown_requested", False, create=True)
+    cameras = mock_cameras(4)
+    mock_paged_client(mocker, {offset: cameras[offset : offset + 1] for offset in range(4)}, total_count=4)
+    mocker.patch("camerametrics.main.extract_and_update_camera_metrics", side_effect=RuntimeError("push failed"))
+    mock_context.page_size = 1
+
+    with pytest.raises(RuntimeError):
+        await fetch_and_update(mock_context, {}, mocker.MagicMock())
+
+    httpx.AsyncClient.return_value.__aexit__.assert_awaited_once()
+
+
 @pytest.mark.asyncio
 async def test_extract_and_update_camera_metrics(mocker, mock_camera_data, mock_context):
     camera_data = await mock_camera_data
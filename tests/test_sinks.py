@@ -0,0 +1,185 @@
+import json
+
+import pytest
+
+from camerametrics.main import extract_camera_fields
+from camerametrics.sinks import (
+    FileSink,
+    InfluxDBSink,
+    Sink,
+    Snapshot,
+    StatsDSink,
+    build_sinks,
+)
+
+from .responses import CAMERA_VALID_RESPONSE
+
+SNAPSHOT = Snapshot(
+    [extract_camera_fields(camera) for camera in CAMERA_VALID_RESPONSE["data"]], timestamp=1700000000.0
+)
+
+
+def test_influxdb_format():
+    sink = InfluxDBSink(url="http://localhost:8086/api/v2/write")
+
+    lines = sink.format(SNAPSHOT)
+
+    assert lines == [
+        "camera,name=Demo\\ Camera,model=UVC\\ G3\\ Dome,host=123.123.123.123,mac=A4BCD4AA9E12,"
+        "firmware_version=v4.23.8,state=CONNECTED "
+        "cpu_load=30.0,memory_used=57061376i,memory_total=358748160i,managed=true,connected=true,"
+        "last_seen=1687410872750i,last_recording_start_time=1691984863143i 1700000000000000000"
+    ]
+
+
+def test_statsd_format_and_packets():
+    sink = StatsDSink(host="localhost", max_packet_size=80)
+
+    lines = sink.format(SNAPSHOT)
+    packets = sink.packets(lines)
+
+    assert "camerametrics.Demo_Camera.cpu_load:30|g" in lines
+    assert "camerametrics.Demo_Camera.connected:1|g" in lines
+    assert sink.count_lines(SNAPSHOT) == len(lines)
+    assert all(len(packet) <= 80 for packet in packets)
+    assert b"\n".join(packets).decode().split("\n") == lines
+
+
+def test_sink_subclass_must_implement_write():
+    class FormatOnlySink(Sink):
+        def format(self, snapshot):
+            return []
+
+    with pytest.raises(TypeError):
+        FormatOnlySink("format-only")
+
+
+@pytest.mark.parametrize(
+    "sink_config",
+    [
+        {"type": "carrier_pigeon"},
+        {"path": "metrics.ndjson"},
+        {"type": "file", "path": "metrics.ndjson", "colour": "blue"},
+        {"type": "file"},
+        {"type": "file", "path": "metrics.ndjson", "batch_size": 0},
+        {"type": "file", "path": "metrics.ndjson", "max_queue": 0},
+        {"type": "file", "path": "metrics.ndjson", "flush_interval": -1},
+    ],
+)
+def test_build_sinks_with_invalid_config(sink_config):
+    with pytest.raises(ValueError):
+        build_sinks([sink_config])
+
+
+@pytest.mark.asyncio
+async def test_file_sink_writes_ndjson(tmp_path):
+    path = tmp_path / "metrics.ndjson"
+    (sink,) = build_sinks([{"type": "file", "path": str(path), "flush_interval": 0.01}])
+
+    await sink.start()
+    sink.submit(SNAPSHOT)
+    sink.submit(SNAPSHOT)
+    await sink.close()
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(records) == 2
+    assert records[0]["name"] == "Demo Camera"
+    assert records[0]["timestamp"] == SNAPSHOT.timestamp
+    assert sink.sent == 2
+    assert sink.dropped == 0
+
+
+@pytest.mark.asyncio
+async def test_sink_keeps_snapshots_larger_than_the_queue(tmp_path):
+    path = tmp_path / "metrics.ndjson"
+    sink = FileSink(path=str(path), batch_size=100, max_queue=10)
+
+    await sink.start()
+    sink.submit(Snapshot(SNAPSHOT.cameras * 2000))
+    await sink.close()
+
+    assert len(path.read_text().splitlines()) == 2000
+    assert sink.sent == 2000
+    assert sink.dropped == 0
+
+
+@pytest.mark.asyncio
+async def test_sink_drops_oldest_snapshot_when_queue_is_full(mocker, tmp_path):
+    path = tmp_path / "metrics.ndjson"
+    sink = FileSink(path=str(path), max_queue=1)
+    mocker.patch("logging.warning")
+
+    await sink.start()
+    sink.submit(Snapshot(SNAPSHOT.cameras * 3, timestamp=1.0))
+    sink.submit(Snapshot(SNAPSHOT.cameras * 2, timestamp=2.0))
+    await sink.close()
+
+    assert [json.loads(line)["timestamp"] for line in path.read_text().splitlines()] == [2.0, 2.0]
+    assert sink.sent == 2
+    assert sink.dropped == 3
+
+
+@pytest.mark.asyncio
+async def test_sink_drops_malformed_snapshots_and_keeps_writing(mocker):
+    sink = StatsDSink(host="localhost", flush_interval=0.01)
+    mocker.patch("logging.error")
+    nameless = Snapshot([{**SNAPSHOT.cameras[0], "name": None}])
+    malformed = Snapshot([{"name": "Broken Camera"}])
+
+    await sink.start()
+    mock_socket = mocker.MagicMock()
+    sink._socket = mock_socket
+    sink.submit(nameless)
+    sink.submit(malformed)
+    sink.submit(SNAPSHOT)
+    await sink.close()
+
+    sent = b"\n".join(call.args[0] for call in mock_socket.sendto.call_args_list).decode()
+    assert "camerametrics.unnamed.cpu_load:30|g" in sent
+    assert "Broken_Camera" not in sent
+    assert sink.sent == 2 * sink.count_lines(SNAPSHOT)
+    assert sink.dropped == sink.count_lines(malformed)
+
+
+@pytest.mark.asyncio
+async def test_closing_an_unopened_sink():
+    sink = InfluxDBSink(url="http://localhost:8086/api/v2/write")
+
+    await sink.release()
+    await sink.close()
+
+    assert sink.sent == 0
+    assert sink.dropped == 0
+
+
+@pytest.mark.asyncio
+async def test_sink_counts_failed_writes_as_dropped(mocker):
+    sink = InfluxDBSink(url="http://localhost:8086/api/v2/write", flush_interval=0.01)
+    mocker.patch.object(sink, "write", side_effect=OSError("connection refused"))
+    mocker.patch("logging.error")
+
+    await sink.start()
+    sink.submit(SNAPSHOT)
+    await sink.close()
+
+    assert sink.sent == 0
+    assert sink.dropped == 1
+
+
+@pytest.mark.asyncio
+async def test_statsd_sink_counts_only_unsent_lines_as_dropped(mocker):
+    sink = StatsDSink(host="localhost", max_packet_size=80, flush_interval=0.01)
+    mocker.patch("logging.error")
+
+    await sink.start()
+    mock_socket = mocker.MagicMock()
+    mock_socket.sendto.side_effect = [None, BlockingIOError("resource temporarily unavailable")]
+    sink._socket = mock_socket
+    lines = sink.format(SNAPSHOT)
+    first_packet = sink.packets(lines)[0]
+    sink.submit(SNAPSHOT)
+    await sink.close()
+
+    mock_socket.sendto.assert_any_call(first_packet, sink._address)
+    assert sink.sent == first_packet.count(b"\n") + 1
+    assert sink.dropped == len(lines) - sink.sent